@@ -9,120 +9,200 @@ Each example must appear either as:
   2. Consecutive source lines in a .rs file (leading/trailing whitespace stripped).
 """
 
+import hashlib
+import mmap
 import os.path
 import re
 import sys
-from concurrent.futures import ThreadPoolExecutor
-
-rust_files: list[str] = []
-md_files: list[str] = []
-
-for root, dirs, files in os.walk("."):
-    dirs[:] = [d for d in dirs if d != "target"]
-    for file in files:
-        if file.endswith(".rs"):
-            rust_files.append(os.path.join(root, file))
-        elif file.endswith(".md") and file != "DEVELOPMENT.md":
-            md_files.append(os.path.join(root, file))
-
-
-# Read all .md files to find rust examples
-find_rust_examples = re.compile(r"```rust((`?`?[^`])*)```", re.DOTALL | re.MULTILINE)
-
-rust_examples_dict: dict[str, tuple[str, int]] = {}
-
-
-def visit_md(p: str) -> None:
-    global rust_examples_dict
-    with open(p) as f:
-        for m in find_rust_examples.finditer(f.read()):
-            rust_examples_dict[m.group(1).strip()] = (p, m.start())
-
-
-with ThreadPoolExecutor() as e:
-    for p in md_files:
-        e.submit(visit_md, p)
-
-rust_examples: list[tuple[str, int, str]] = [
-    (p, off, content) for content, (p, off) in rust_examples_dict.items()
-]
-
-rust_examples.sort()
-
-# Read all rust files to se if they contain the rust examples from the md files
-
-find_examples = re.compile(
-    "|".join(
-        "("
-        + ("\\n".join(["//[!/][ ]?" + re.escape(line) for line in e.split("\n")]))
-        + ")"
-        for (_, _, e) in rust_examples
-    )
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# Read all .md files to find rust examples. The body repeat is possessive: a
+# chunk can never consume the start of the closing ```, so there is nothing to
+# backtrack into when an unterminated block is scanned
+find_rust_examples = re.compile(
+    rb"```rust((?:`?`?[^`])*+)```", re.DOTALL | re.MULTILINE
 )
 
-found = [False for _ in rust_examples]
-
-
-def visit_rust(p: str) -> None:
-    global found
-    with open(p) as f:
-        for m in find_examples.finditer(f.read()):
-            for g, v in enumerate(m.groups()):
-                if v is not None:
-                    found[g] = True
-
-
-with ThreadPoolExecutor() as e:
-    for p in rust_files:
-        e.submit(visit_rust, p)
-
-# -- Pass 2: plain source-line match ------------------------------------------
-# Build an index: stripped_line -> [(file, line_number)].
-# Then for each still-unfound example, check whether all of its lines appear
-# consecutively (after stripping leading/trailing whitespace) in a single file.
-
-file_lines: dict[str, list[str]] = {}
-source_line_index: dict[str, list[tuple[str, int]]] = {}
-
-for p in rust_files:
-    with open(p) as f:
-        lines = [ln.rstrip("\n").strip() for ln in f]
-    file_lines[p] = lines
-    for i, stripped in enumerate(lines):
-        source_line_index.setdefault(stripped, []).append((p, i))
-
-
-def example_in_source(example: str) -> bool:
-    ex_lines = [ln.strip() for ln in example.split("\n")]
-    if not ex_lines:
-        return False
-    first = ex_lines[0]
-    for file, start in source_line_index.get(first, []):
-        flines = file_lines[file]
-        n = len(ex_lines)
-        if start + n > len(flines):
+# Matches a //! or /// comment line, capturing the text after the marker
+find_doc_comments = re.compile(rb"^[ \t]*//[!/](.*?)[^\S\n]*$", re.MULTILINE)
+
+# Maps the first line of each multi-line example to the (index, lines) of the
+# examples starting with it. Built in each worker process by init_rust_worker
+examples_by_first_line: dict[str, list[tuple[int, list[str]]]]
+
+# (index, line) of the single-line examples
+single_line_examples: list[tuple[int, str]]
+
+# As examples_by_first_line, for all examples, with leading/trailing whitespace
+# stripped from the utf-8 encoded lines
+examples_by_first_stripped_line: dict[bytes, list[tuple[int, list[bytes]]]]
+
+# Matches every line, without its line terminator
+find_lines = re.compile(rb"^.*$", re.MULTILINE)
+
+
+@contextmanager
+def map_file(p: str) -> Iterator[mmap.mmap | bytes]:
+    """Memory map the file p read only."""
+    with open(p, "rb") as f:
+        # Empty files cannot be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def visit_md(p: str) -> list[tuple[str, str, int]]:
+    """Return (content, path, offset) for every rust example in the markdown file p."""
+    with map_file(p) as data:
+        return [
+            (m.group(1).strip().decode(), p, m.start())
+            for m in find_rust_examples.finditer(data)
+        ]
+
+
+def init_rust_worker(examples: list[str]) -> None:
+    """Index the examples by their first line."""
+    global examples_by_first_line, examples_by_first_stripped_line
+    global single_line_examples
+    examples_by_first_line = {}
+    examples_by_first_stripped_line = {}
+    single_line_examples = []
+    for i, e in enumerate(examples):
+        lines = [line.rstrip() for line in e.split("\n")]
+        if len(lines) == 1:
+            single_line_examples.append((i, lines[0]))
+        else:
+            examples_by_first_line.setdefault(lines[0], []).append((i, lines))
+        stripped = [line.encode().strip() for line in lines]
+        examples_by_first_stripped_line.setdefault(stripped[0], []).append(
+            (i, stripped)
+        )
+
+
+def find_in_doc_comments(data: mmap.mmap | bytes) -> list[int]:
+    """Return the indices of the examples found as doc comments in data."""
+    # Most rust files have no doc comments; a plain substring search is
+    # much cheaper than running the regex over them
+    if data.find(b"//!") == -1 and data.find(b"///") == -1:
+        return []
+    # Runs of consecutive doc-comment lines, each line given as the possible
+    # example lines it can match, with and without one leading space
+    runs: list[list[tuple[str, ...]]] = []
+    end = -2
+    for m in find_doc_comments.finditer(data):
+        if m.start() != end + 1:
+            runs.append([])
+        body = m.group(1).decode()
+        runs[-1].append((body, body[1:]) if body.startswith(" ") else (body,))
+        end = m.end()
+    # All but the last example line must match a whole comment line. The last
+    # line only has to be a prefix, so trailing text such as `foo(); // note`
+    # after the example on its last line is allowed.
+    found: list[int] = []
+    for bodies in runs:
+        for start, candidates in enumerate(bodies):
+            for i, line in single_line_examples:
+                if any(body.startswith(line) for body in candidates):
+                    found.append(i)
+            for first in candidates:
+                for i, lines in examples_by_first_line.get(first, []):
+                    n = len(lines)
+                    if start + n > len(bodies):
+                        continue
+                    if all(
+                        lines[j] in bodies[start + j] for j in range(1, n - 1)
+                    ) and any(
+                        body.startswith(lines[-1]) for body in bodies[start + n - 1]
+                    ):
+                        found.append(i)
+    return found
+
+
+def find_in_source(data: mmap.mmap | bytes) -> list[int]:
+    """Return the indices of the examples found as consecutive source lines in data."""
+    # The lines are scanned in place in the mapped data; active holds
+    # (index, lines, number of lines matched) for the examples matching the
+    # lines just before the current one
+    found: list[int] = []
+    active: list[tuple[int, list[bytes], int]] = []
+    for m in find_lines.finditer(data):
+        line = m.group().strip()
+        matched = [(i, lines, j + 1) for i, lines, j in active if lines[j] == line]
+        for i, lines in examples_by_first_stripped_line.get(line, []):
+            matched.append((i, lines, 1))
+        active = []
+        for i, lines, j in matched:
+            if j == len(lines):
+                found.append(i)
+            else:
+                active.append((i, lines, j))
+    return found
+
+
+def visit_rust(p: str) -> list[int]:
+    """Return the indices of the examples found in the rust file p."""
+    with map_file(p) as data:
+        return find_in_doc_comments(data) + find_in_source(data)
+
+
+def main() -> None:
+    rust_files: list[str] = []
+    md_files: list[str] = []
+
+    for root, dirs, files in os.walk("."):
+        dirs[:] = [d for d in dirs if d != "target"]
+        for file in files:
+            if file.endswith(".rs"):
+                rust_files.append(os.path.join(root, file))
+            elif file.endswith(".md") and file != "DEVELOPMENT.md":
+                md_files.append(os.path.join(root, file))
+
+    # Examples keyed by a digest of their content, to deduplicate them
+    rust_examples_dict: dict[bytes, tuple[str, int, str]] = {}
+
+    with ProcessPoolExecutor() as e:
+        for res in e.map(visit_md, md_files, chunksize=8):
+            for content, p, off in res:
+                key = hashlib.blake2b(content.encode(), digest_size=16).digest()
+                rust_examples_dict[key] = (p, off, content)
+
+    rust_examples: list[tuple[str, int, str]] = list(rust_examples_dict.values())
+
+    rust_examples.sort()
+
+    # Read all rust files to se if they contain the rust examples from the md files
+
+    # found[i] is set when rust_examples[i] is found; the workers report the
+    # indices into the example list they were initialized with
+    found = bytearray(len(rust_examples))
+
+    with ProcessPoolExecutor(
+        initializer=init_rust_worker, initargs=([e for (_, _, e) in rust_examples],)
+    ) as e:
+        for res in e.map(visit_rust, rust_files, chunksize=8):
+            for i in res:
+                found[i] = 1
+
+    bad = 0
+
+    # Complain about all the missing rust examples
+
+    for i, (file, off, example) in enumerate(rust_examples):
+        if found[i]:
             continue
-        if all(flines[start + j] == ex_lines[j] for j in range(1, n)):
-            return True
-    return False
-
-
-for i, (_file, _off, example) in enumerate(rust_examples):
-    if not found[i]:
-        found[i] = example_in_source(example)
-
-bad = 0
+        print(
+            f"Rust example from {file} not found:\n{'\n'.join(f'  {line}' for line in example.split('\n'))}\n\n"
+        )
+        bad += 1
 
-# Complain about all the missing rust examples
+    if bad:
+        print(f"{bad} missing markdown examples")
+        sys.exit(1)
 
-for (file, off, example), f in zip(rust_examples, found):
-    if f:
-        continue
-    print(
-        f"Rust example from {file} not found:\n{'\n'.join(f'  {line}' for line in example.split('\n'))}\n\n"
-    )
-    bad += 1
 
-if bad:
-    print(f"{bad} missing markdown examples")
-    sys.exit(1)
+if __name__ == "__main__":
+    main()
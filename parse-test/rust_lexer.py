@@ -1,69 +1,99 @@
+import mmap
+import os
 import re
+from collections.abc import Buffer
 from typing import List
 
 # Minimal Rust lexer using Python regex.
 # This module only extracts string literal tokens from Rust source.
+#
+# Only comments and string literals are matched; everything in between is
+# skipped by finditer inside the regex engine rather than being returned as
+# single character tokens to the Python loop. The regex works on bytes so a
+# memory mapped file can be lexed without reading it into a str first; only
+# the matched string literals are decoded.
 
 TOKEN_SPEC = [
     ("LINE_COMMENT", r"//[^\n]*"),
     ("BLOCK_COMMENT", r"/\*[\s\S]*?\*/"),
-    ("WHITESPACE", r"[ \t\r\n]+"),
     # Raw strings with hashes, e.g. r#"..."# or br###"..."###
-    ("RAW_HASHED", r'(?:br|r)(?P<HASHES>#+)"(?s:.*?)"(?P=HASHES)'),
+    ("RAW_HASHED", r'(?:br|r)(?P<HASHES>#+)"(?P<RAW_HASHED_BODY>(?s:.*?))"(?P=HASHES)'),
     # Raw strings without hashes, e.g. r"..." or br"..."
-    ("RAW", r'(?:br|r)"(?s:.*?)"'),
+    ("RAW", r'(?:br|r)"(?P<RAW_BODY>(?s:.*?))"'),
     # Normal double-quoted strings (not raw) - do not include newlines
-    ("STRING", r'"(?:\\.|[^"\\\n])*"'),
-    ("UNKNOWN", r"."),
+    ("STRING", r'"(?P<STRING_BODY>[^"\\\n]*(?:\\.[^"\\\n]*)*)"'),
 ]
 
 MASTER_REGEX = re.compile(
-    "|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_SPEC), re.MULTILINE
+    "|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_SPEC).encode(),
+    re.MULTILINE,
 )
 
 
-def lex(text: str) -> List[str]:
-    """Return a list of string literal token values found in `text`.
+# A backslash escape in a normal string: \u{...}, \xNN or a single character
+_ESCAPE = re.compile(r"\\(u\{([0-9A-Fa-f]+)\}|x([0-9A-Fa-f]{2})|.)", re.DOTALL)
 
-    Only tokens of kind 'STRING' are returned; other token kinds are skipped.
-    The returned strings include their surrounding quotes as in the source.
-    """
-
-    def _unescape_normal(s: str) -> str:
-        # remove surrounding quotes
-        inner = s[1:-1]
+# Single character escapes
+_SIMPLE_ESCAPES = {
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "\\": "\\",
+    "0": "\0",
+    "'": "'",
+    '"': '"',
+}
 
-        # convert Rust \u{...} escapes to actual chars
-        def _repl_u(m):
-            code = int(m.group(1), 16)
-            try:
-                return chr(code)
-            except Exception:
-                return ""
 
-        inner = re.sub(r"\\u\{([0-9A-Fa-f]+)\}", _repl_u, inner)
-        # Use python's unicode_escape for common escapes like \n, \t, \xNN
+def _repl_escape(m: re.Match[str]) -> str:
+    if (code := m.group(2)) is not None:
         try:
-            return bytes(inner, "utf-8").decode("unicode_escape")
-        except Exception:
-            # fallback: unescape only simple sequences
-            return inner.replace('\\"', '"').replace("\\\\", "\\")
-
-    def _strip_raw(s: str) -> str:
-        # raw forms may start with r or br, possibly followed by hashes before the opening quote
-        # find first double-quote and last double-quote
-        first = s.find('"')
-        last = s.rfind('"')
-        if first == -1 or last == -1 or last <= first:
+            return chr(int(code, 16))
+        except (ValueError, OverflowError):
             return ""
-        return s[first + 1 : last]
+    if (code := m.group(3)) is not None:
+        return chr(int(code, 16))
+    # Unknown escapes are kept as written
+    return _SIMPLE_ESCAPES.get(m.group(1), m.group())
+
+
+def _unescape_normal(s: str) -> str:
+    return _ESCAPE.sub(_repl_escape, s)
+
+
+def lex(text: Buffer) -> List[str]:
+    """Return a list of string literal token values found in the UTF-8 `text`.
 
+    Only string literal tokens are returned; other token kinds are skipped.
+    The returned strings are the literal contents without quotes, with
+    escapes in normal strings resolved.
+    """
     tokens: List[str] = []
+    append = tokens.append
     for m in MASTER_REGEX.finditer(text):
         kind = m.lastgroup
-        val = m.group()
         if kind == "STRING":
-            tokens.append(_unescape_normal(val))
-        elif kind in ("RAW", "RAW_HASHED"):
-            tokens.append(_strip_raw(val))
+            body = m["STRING_BODY"]
+            # Most literals have nothing to unescape
+            if b"\\" in body:
+                append(_unescape_normal(body.decode()))
+            else:
+                append(body.decode())
+        elif kind == "RAW":
+            append(m["RAW_BODY"].decode())
+        elif kind == "RAW_HASHED":
+            append(m["RAW_HASHED_BODY"].decode())
     return tokens
+
+
+def lex_file(path: str) -> List[str]:
+    """Return the string literal token values found in the Rust file at `path`.
+
+    The file is memory mapped rather than read into memory.
+    """
+    with open(path, "rb") as f:
+        # Empty files cannot be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return lex(mm)
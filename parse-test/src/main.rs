@@ -3,7 +3,7 @@
 use clap::{Parser, ValueEnum};
 use serde::Serialize;
 use std::fs;
-use std::io::Read;
+use std::io::{Read, Write};
 use std::path::PathBuf;
 
 /// JSON output structure containing the parsed value and any issues.
@@ -59,6 +59,11 @@ struct Args {
     /// Parse in function/procedure body mode (allows BEGIN...END blocks)
     #[arg(long, default_value_t = false)]
     function_body: bool,
+
+    /// Serve length prefixed parse requests from stdin until it is closed,
+    /// instead of parsing a single input (json and pretty-json output only).
+    #[arg(long, default_value_t = false)]
+    server: bool,
 }
 
 /// Supported SQL dialects for parsing.
@@ -83,10 +88,134 @@ fn map_dialect(d: DialectArg) -> qusql_parse::SQLDialect {
     }
 }
 
+/// Parse `src` and render the result and issues as a JSON [`ResultOut`].
+///
+/// `output_format` selects between debug-printed issues ([`OutputFormatArg::Json`])
+/// and rendered reports ([`OutputFormatArg::PrettyJson`]); `file` is the name
+/// used in the reports.
+fn parse_to_json(
+    src: &str,
+    file: &str,
+    options: &qusql_parse::ParseOptions,
+    multiple: bool,
+    output_format: OutputFormatArg,
+) -> String {
+    let mut issues = qusql_parse::Issues::new(src);
+    let value = if multiple {
+        let stms = qusql_parse::parse_statements(src, &mut issues, options);
+        Some(format!("{:#?}", stms))
+    } else {
+        qusql_parse::parse_statement(src, &mut issues, options).map(|v| format!("{:#?}", v))
+    };
+    let success = issues
+        .issues
+        .iter()
+        .all(|issue| issue.level != qusql_parse::Level::Error);
+
+    let issues = match output_format {
+        OutputFormatArg::PrettyJson => {
+            use ariadne::{Color, Label, Report, ReportKind, Source};
+            let b2c = qusql_parse::ByteToChar::new(src.as_bytes());
+            let mut pretty_issues = Vec::new();
+            for issue in issues.get() {
+                let span = b2c.map_span(issue.span.clone());
+                let mut w = Vec::new();
+                Report::build(ReportKind::Error, (&file, span.clone()))
+                    .with_message(&issue.message)
+                    .with_label(
+                        Label::new((&file, span))
+                            .with_message("Issue here")
+                            .with_color(Color::Red),
+                    )
+                    .finish()
+                    .write((&file, Source::from(src)), &mut w)
+                    .unwrap();
+                pretty_issues.push(String::from_utf8(w).unwrap());
+            }
+            pretty_issues
+        }
+        OutputFormatArg::Json | OutputFormatArg::Pretty => issues
+            .issues
+            .iter()
+            .map(|issue| format!("{:#?}", issue))
+            .collect(),
+    };
+
+    let result = ResultOut {
+        value,
+        issues,
+        success,
+    };
+    serde_json::to_string_pretty(&result).unwrap()
+}
+
+/// Serve parse requests from stdin until it is closed.
+///
+/// A request is a little endian `u32` byte length, that many bytes of UTF-8
+/// SQL and a flags byte, where bit 0 enables function body mode. Each request
+/// is answered on stdout with a little endian `u32` byte length followed by
+/// the JSON output of [`parse_to_json`]. A zero length answer means the input
+/// was not valid UTF-8 or the parser panicked.
+fn serve(args: &Args, options: &qusql_parse::ParseOptions) {
+    let mut stdin = std::io::stdin().lock();
+    let mut stdout = std::io::stdout().lock();
+    let multiple = args.multiple;
+    let output_format = args.output_format;
+    let mut len = [0u8; 4];
+    loop {
+        match stdin.read_exact(&mut len) {
+            Ok(()) => (),
+            Err(e) if e.kind() == std::io::ErrorKind::UnexpectedEof => return,
+            Err(e) => {
+                eprintln!("Failed to read from stdin: {}", e);
+                std::process::exit(2);
+            }
+        }
+        let mut request = vec![0u8; u32::from_le_bytes(len) as usize + 1];
+        if let Err(e) = stdin.read_exact(&mut request) {
+            eprintln!("Failed to read from stdin: {}", e);
+            std::process::exit(2);
+        }
+        let flags = request.pop().unwrap_or_default();
+        let response = match String::from_utf8(request) {
+            Ok(src) => {
+                let options = options.clone().function_body(flags & 1 != 0);
+                std::panic::catch_unwind(|| {
+                    parse_to_json(&src, "-", &options, multiple, output_format)
+                })
+                .unwrap_or_default()
+            }
+            Err(_) => String::new(),
+        };
+        let written = stdout
+            .write_all(&(response.len() as u32).to_le_bytes())
+            .and_then(|()| stdout.write_all(response.as_bytes()))
+            .and_then(|()| stdout.flush());
+        if let Err(e) = written {
+            eprintln!("Failed to write to stdout: {}", e);
+            std::process::exit(2);
+        }
+    }
+}
+
 /// Entry point: parse the file given by `--file` and print JSON.
 fn main() {
     let args = Args::parse();
 
+    let options = qusql_parse::ParseOptions::new()
+        .dialect(map_dialect(args.dialect))
+        .arguments(if matches!(args.dialect, DialectArg::Postgresql) {
+            qusql_parse::SQLArguments::Dollar
+        } else {
+            qusql_parse::SQLArguments::QuestionMark
+        })
+        .function_body(args.function_body);
+
+    if args.server {
+        serve(&args, &options);
+        return;
+    }
+
     let src = match &args.file {
         Some(path) if matches!(path.to_str(), Some("-")) => {
             let mut s = String::new();
@@ -113,17 +242,14 @@ fn main() {
         }
     };
 
-    let options = qusql_parse::ParseOptions::new()
-        .dialect(map_dialect(args.dialect))
-        .arguments(if matches!(args.dialect, DialectArg::Postgresql) {
-            qusql_parse::SQLArguments::Dollar
-        } else {
-            qusql_parse::SQLArguments::QuestionMark
-        })
-        .function_body(args.function_body);
-    let mut issues = qusql_parse::Issues::new(&src);
+    let file = args
+        .file
+        .as_ref()
+        .map(|v| v.display().to_string())
+        .unwrap_or("-".to_string());
 
     if args.benchmark {
+        let mut issues = qusql_parse::Issues::new(&src);
         let start = std::time::Instant::now();
         let mut sum = 0;
         for _ in 0..args.benchmark_iterations {
@@ -148,7 +274,9 @@ fn main() {
             "Benchmark: {} iterations took {:.2?} (sum = {})",
             args.benchmark_iterations, duration, sum
         );
-    } else {
+    } else if let OutputFormatArg::Pretty = args.output_format {
+        use ariadne::{Color, Label, Report, ReportKind, Source};
+        let mut issues = qusql_parse::Issues::new(&src);
         let value = if args.multiple {
             let stms = qusql_parse::parse_statements(&src, &mut issues, &options);
             Some(format!("{:#?}", stms))
@@ -159,83 +287,31 @@ fn main() {
             .issues
             .iter()
             .all(|issue| issue.level != qusql_parse::Level::Error);
-
-        match args.output_format {
-            OutputFormatArg::Json => {
-                let issues = issues
-                    .issues
-                    .iter()
-                    .map(|issue| format!("{:#?}", issue))
-                    .collect();
-
-                let result = ResultOut {
-                    value,
-                    issues,
-                    success,
-                };
-                println!("{}", serde_json::to_string_pretty(&result).unwrap());
-            }
-            OutputFormatArg::PrettyJson => {
-                use ariadne::{Color, Label, Report, ReportKind, Source};
-                let file = args
-                    .file
-                    .as_ref()
-                    .map(|v| v.display().to_string())
-                    .unwrap_or("-".to_string());
-                let b2c = qusql_parse::ByteToChar::new(src.as_bytes());
-                let mut pretty_issues = Vec::new();
-                for issue in issues.get() {
-                    let span = b2c.map_span(issue.span.clone());
-                    let mut w = Vec::new();
-                    Report::build(ReportKind::Error, (&file, span.clone()))
-                        .with_message(&issue.message)
-                        .with_label(
-                            Label::new((&file, span))
-                                .with_message("Issue here")
-                                .with_color(Color::Red),
-                        )
-                        .finish()
-                        .write((&file, Source::from(&src)), &mut w)
-                        .unwrap();
-                    pretty_issues.push(String::from_utf8(w).unwrap());
-                }
-
-                let result = ResultOut {
-                    value,
-                    issues: pretty_issues,
-                    success,
-                };
-                println!("{}", serde_json::to_string_pretty(&result).unwrap());
-            }
-            OutputFormatArg::Pretty => {
-                use ariadne::{Color, Label, Report, ReportKind, Source};
-                let file = args
-                    .file
-                    .as_ref()
-                    .map(|v| v.display().to_string())
-                    .unwrap_or("-".to_string());
-                if let Some(value) = &value {
-                    println!("Parsed AST:\n{}", value);
-                } else {
-                    println!()
-                }
-                let b2c = qusql_parse::ByteToChar::new(src.as_bytes());
-                println!("Issues:");
-                for issue in issues.get() {
-                    let span = b2c.map_span(issue.span.clone());
-                    Report::build(ReportKind::Error, (&file, span.clone()))
-                        .with_message(&issue.message)
-                        .with_label(
-                            Label::new((&file, span))
-                                .with_message("Issue here")
-                                .with_color(Color::Red),
-                        )
-                        .finish()
-                        .print((&file, Source::from(&src)))
-                        .unwrap();
-                }
-                println!("Success: {}", success);
-            }
+        if let Some(value) = &value {
+            println!("Parsed AST:\n{}", value);
+        } else {
+            println!()
+        }
+        let b2c = qusql_parse::ByteToChar::new(src.as_bytes());
+        println!("Issues:");
+        for issue in issues.get() {
+            let span = b2c.map_span(issue.span.clone());
+            Report::build(ReportKind::Error, (&file, span.clone()))
+                .with_message(&issue.message)
+                .with_label(
+                    Label::new((&file, span))
+                        .with_message("Issue here")
+                        .with_color(Color::Red),
+                )
+                .finish()
+                .print((&file, Source::from(&src)))
+                .unwrap();
         }
+        println!("Success: {}", success);
+    } else {
+        println!(
+            "{}",
+            parse_to_json(&src, &file, &options, args.multiple, args.output_format)
+        );
     }
 }
@@ -7,14 +7,28 @@ It supports multiple SQL dialects (MySQL/MariaDB, PostgreSQL, SQLite) and provid
 both interactive and automated testing modes.
 """
 
+import os
 import rust_lexer
 import subprocess
 import json
 import sys
-from typing import TypedDict, NotRequired, Optional
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TypedDict, NotRequired, Optional, TypeVar
 import argparse
 import time
 
+try:
+    # orjson is considerably faster at decoding the parser output
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 class TestCase(TypedDict):
     """
@@ -43,22 +57,20 @@ def read_tests(path: str) -> dict[str, TestCase]:
 
     Returns a dictionary mapping SQL input strings to TestCase objects.
     """
-    tests = {}
     with open(path, "r") as f:
-        data = json.load(f)
-        for item in data:
-            tests[item["input"]] = item
-    return tests
+        return {item["input"]: item for item in json.load(f)}
 
 
 def write_tests(path: str, tests: dict[str, TestCase]) -> None:
     """
     Write test cases back to a JSON file, sorted by input SQL.
     """
-    tests_lists = list(tests.values())
-    tests_lists.sort(key=lambda t: t["input"])
+    tests_lists = sorted(tests.values(), key=lambda t: t["input"])
+    # json.dump writes every small encoder chunk separately; encode the whole
+    # document first and write it in one go
+    data = json.dumps(tests_lists, indent=2)
     with open(path, "w") as f:
-        json.dump(tests_lists, f, indent=2)
+        f.write(data)
 
 
 def import_tests(
@@ -78,19 +90,18 @@ def import_tests(
     """
     tests = read_tests(tests_file)
     try:
-        with open(source_file) as f:
-            for token in rust_lexer.lex(f.read()):
-                token = token.strip()
-                match = False
-                # Check if this SQL statement contains a relevant keyword
-                for keyword in keywords:
-                    if keyword in token:
-                        match = True
-                        break
-                # Skip if no keyword match or already in tests
-                if not match or token in tests:
-                    continue
-                tests[token] = TestCase(input=token)
+        for token in rust_lexer.lex_file(source_file):
+            token = token.strip()
+            match = False
+            # Check if this SQL statement contains a relevant keyword
+            for keyword in keywords:
+                if keyword in token:
+                    match = True
+                    break
+            # Skip if no keyword match or already in tests
+            if not match or token in tests:
+                continue
+            tests[token] = TestCase(input=token)
         write_tests(tests_file, tests)
         print(f"Imported {dialect_name} tests successfully")
     except FileNotFoundError:
@@ -154,34 +165,110 @@ def import_postgresql_tests(args) -> None:
     )
 
 
-def run_parser(
-    sql: str, dialect: str, not_pretty: bool, function_body: bool = False
-) -> subprocess.CompletedProcess:
+class ParserClient:
     """
-    Run the parse-test binary with the given SQL and dialect.
+    A long running parse-test process answering parse requests.
 
-    Args:
-        sql: The SQL statement to parse
-        dialect: The SQL dialect to use ('maria', 'postgresql', or 'sqlite')
-        function_body: Whether to parse in function/procedure body mode
+    The process is started with --server and reads one length prefixed request
+    per test case from stdin, which avoids starting a process per test case.
+    If the process dies while parsing, the request is reported as a crash and
+    a new process is started for the next request.
+    """
 
-    Returns:
-        CompletedProcess object with stdout/stderr/returncode
+    def __init__(self, dialect: str, not_pretty: bool) -> None:
+        """
+        Args:
+            dialect: The SQL dialect to use ('maria', 'postgresql', or 'sqlite')
+            not_pretty: Report issues in debug format instead of rendered reports
+        """
+        self.cmd = [
+            "../target/release/parse-test",
+            "--server",
+            "--dialect",
+            dialect,
+            "--output-format",
+            "json" if not_pretty else "pretty-json",
+        ]
+        self.proc: Optional[subprocess.Popen] = None
+
+    def parse(
+        self, sql: bytes, function_body: bool = False
+    ) -> subprocess.CompletedProcess:
+        """
+        Parse the given SQL.
+
+        Args:
+            sql: The UTF-8 encoded SQL statement to parse
+            function_body: Whether to parse in function/procedure body mode
+
+        Returns:
+            CompletedProcess object with the JSON output in stdout, and a
+            non-zero returncode if the parser crashed
+        """
+        if self.proc is None:
+            self.proc = subprocess.Popen(
+                self.cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        assert self.proc.stdin is not None and self.proc.stdout is not None
+        try:
+            self.proc.stdin.writelines(
+                (
+                    len(sql).to_bytes(4, "little"),
+                    sql,
+                    b"\x01" if function_body else b"\x00",
+                )
+            )
+            self.proc.stdin.flush()
+            header = self.proc.stdout.read(4)
+        except BrokenPipeError:
+            header = b""
+        if len(header) == 4:
+            size = int.from_bytes(header, "little")
+            if size == 0:
+                # The parser panicked, but the process is still serving
+                return subprocess.CompletedProcess(self.cmd, 1, b"")
+            out = self.proc.stdout.read(size)
+            if len(out) == size:
+                return subprocess.CompletedProcess(self.cmd, 0, out)
+        # The process died while parsing
+        self.close()
+        return subprocess.CompletedProcess(self.cmd, 1, b"")
+
+    def close(self) -> None:
+        """Stop the parse-test process if it is running."""
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            self.proc.wait()
+            self.proc = None
+
+
+def map_parallel(
+    fn: Callable[[T], R], items: Iterable[T], workers: int
+) -> Iterator[tuple[T, R]]:
     """
-    cmd = [
-        "../target/release/parse-test",
-        "--dialect",
-        dialect,
-        "--output-format",
-        "json" if not_pretty else "pretty-json",
-    ]
-    if function_body:
-        cmd.append("--function-body")
-    return subprocess.run(
-        cmd,
-        capture_output=True,
-        input=sql.encode(),
-    )
+    Yield (item, fn(item)) for each item, in order, running fn on a thread pool.
+
+    At most 2*workers calls are queued ahead of the consumer, so stopping the
+    iteration early does not leave a large backlog to run.
+    """
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending: deque[tuple[T, Future[R]]] = deque()
+        for item in items:
+            pending.append((item, pool.submit(fn, item)))
+            if len(pending) >= 2 * workers:
+                item, future = pending.popleft()
+                yield item, future.result()
+        for item, future in pending:
+            yield item, future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
 
 
 def test_dialect(args, tests_file: str, dialect: str, dialect_name: str) -> int:
@@ -201,28 +288,48 @@ def test_dialect(args, tests_file: str, dialect: str, dialect_name: str) -> int:
 
     failure_count = 0
 
-    for inp, test in tests.items():
-        # Apply filter if specified
-        if args.filter and args.filter not in inp:
-            continue
+    # Apply filter if specified
+    selected = [
+        (inp, test, inp.encode())
+        for inp, test in tests.items()
+        if not args.filter or args.filter in inp
+    ]
+
+    # One parse-test process per thread
+    clients: list[ParserClient] = []
+    local = threading.local()
 
+    def run(case: tuple[str, TestCase, bytes]) -> subprocess.CompletedProcess:
         # Run the parser on this test case
-        result = run_parser(
-            test["input"],
-            dialect,
-            args.interactive or args.update_output,
-            function_body=test.get("function_body", False),
-        )
+        _, test, sql = case
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = ParserClient(
+                dialect, args.interactive or args.update_output
+            )
+            clients.append(client)
+        return client.parse(sql, function_body=test.get("function_body", False))
+
+    if args.interactive:
+        # Interactive mode prompts between tests, so run them one at a time
+        results = ((case, run(case)) for case in selected)
+    else:
+        results = map_parallel(run, selected, os.cpu_count() or 1)
+
+    # Output is collected and written in batches instead of printing line by
+    # line, except in interactive mode where it must appear before the prompt
+    buf: list[str] = []
 
+    for (inp, test, _), result in results:
         if args.update_output:
             # Update output mode: automatically update output and issues without user input
             if result.returncode != 0:
-                print(f"Crash: {test['input'][:80]}")
+                buf.append(f"Crash: {test['input'][:80]}\n")
                 test["failure"] = True
                 test.pop("output", None)
                 test.pop("issues", None)
             else:
-                out = json.loads(result.stdout.decode())
+                out = json_loads(result.stdout)
                 # Update test output and issues
                 if "value" in out:
                     test["output"] = out.get("value")
@@ -237,11 +344,11 @@ def test_dialect(args, tests_file: str, dialect: str, dialect_name: str) -> int:
                 if out["success"]:
                     test.pop("failure", None)
                     if not getattr(args, "failures_only", False):
-                        print(f"Updated (success): {test['input'][:80]}")
+                        buf.append(f"Updated (success): {test['input'][:80]}\n")
                 else:
                     test["failure"] = True
                     if not getattr(args, "failures_only", False):
-                        print(f"Updated (failure): {test['input'][:80]}")
+                        buf.append(f"Updated (failure): {test['input'][:80]}\n")
         elif args.interactive:
             # Interactive mode: prompt user to update expected results
             if result.returncode != 0:
@@ -252,7 +359,7 @@ def test_dialect(args, tests_file: str, dialect: str, dialect_name: str) -> int:
                 test.pop("output", None)
                 test.pop("issues", None)
             else:
-                out = json.loads(result.stdout.decode())
+                out = json_loads(result.stdout)
                 # Check if test output has changed
                 if (
                     test.get("output") != out.get("value")
@@ -312,28 +419,37 @@ def test_dialect(args, tests_file: str, dialect: str, dialect_name: str) -> int:
         else:
             # Non-interactive mode: just report pass/fail
             if result.returncode != 0:
-                print(f"Crash in: {inp}")
+                buf.append(f"Crash in: {inp}\n")
                 failure_count += 1
             else:
-                out = json.loads(result.stdout.decode())
+                out = json_loads(result.stdout)
                 # Check if test behaved as expected
                 if out["success"] == test.get("should_fail", False):
                     # Test failed (either couldn't parse expected-to-parse, or parsed expected-to-fail)
                     if not out["success"]:
-                        print(f"Test failed: '{inp}'")
+                        buf.append(f"Test failed: '{inp}'\n")
                     else:
-                        print(f"Unexpected success: '{inp}'")
-                    print(f"Output: {out['value']}")
-                    print("Issues:")
+                        buf.append(f"Unexpected success: '{inp}'\n")
+                    buf.append(f"Output: {out['value']}\n")
+                    buf.append("Issues:\n")
                     for issue in out["issues"]:
-                        print(f"  {issue.replace('\\n', '\\n  ')}")
+                        buf.append(f"  {issue.replace('\\n', '\\n  ')}\n")
                     failure_count += 1
                     limit = getattr(args, "limit", None)
                     if limit is not None and failure_count >= limit:
                         break
                 else:
                     if not getattr(args, "failures_only", False):
-                        print(f"Test passed in: '{inp}'")
+                        buf.append(f"Test passed in: '{inp}'\n")
+
+        if len(buf) >= 1000:
+            sys.stdout.writelines(buf)
+            buf.clear()
+
+    sys.stdout.writelines(buf)
+    results.close()
+    for client in clients:
+        client.close()
 
     # Save changes if in interactive or update-output mode
     if args.interactive or args.update_output: